@@ -184,6 +184,7 @@ class SESubscriber (NamedTuple):
     id: Union[uuid.UUID, str]
     ref: Union[weakref.ref, weakref.WeakMethod]
     flags: SESType
+    predicate: Optional[Callable[[EventPayload], bool]] = None
 
 
 class SubscribedEvent:
@@ -229,10 +230,22 @@ class SubscribedEvent:
     async def subscribe(self,
                         callback: Callable[
                             [EventPayload], Union[None,
-                                                  Awaitable]]) -> uuid.UUID:
+                                                  Awaitable]],
+                        predicate: Optional[Callable[
+                            [EventPayload], bool]] = None,
+                        first: bool = False) -> uuid.UUID:
         """
         Subscribe to the series of events
 
+        If predicate is given, callback is only called for payloads
+        where predicate(payload) is true. It is called inline by publish()
+        so should be quick and not raise.
+
+        Subscribers are called in order of subscription. If first is True,
+        callback is called ahead of those already subscribed, such as for
+        a publisher that needs to update its own state before others see
+        the payload.
+
         Returns a UUID that can be later used to unsubscribe
         """
 
@@ -273,10 +286,14 @@ class SubscribedEvent:
 
         ses = SESubscriber(id=subscriber_id,
                            ref=cb_ref,
-                           flags=flags)
+                           flags=flags,
+                           predicate=predicate)
 
         async with self._subscriber_list_lock:
-            self._subscribers.append(ses)
+            if first:
+                self._subscribers.insert(0, ses)
+            else:
+                self._subscribers.append(ses)
         logger.debug(
             f"Subscribed {callback} {ses.flags} as {ses.id} "
             f"to event with sender '{self.sender}'")
@@ -322,11 +339,12 @@ class SubscribedEvent:
               (Or not, as it isn't exposed as a writable object through an API)
         """
         payload._sender = self._sender
+        if payload._internal_only and not self.has_subscribers:
+            # Nowhere to deliver it, skip the lock
+            self._stamp_as_sent(payload)
+            return []
         async with self._subscriber_list_lock:
-            if self._adjust_payload is not None:
-                self._adjust_payload(self, payload)
-            payload._event_time = time.time()
-            self._last_sent = payload
+            self._stamp_as_sent(payload)
             tasks = []
             for s in self._subscribers:
                 # These have ben validated as coroutines
@@ -341,6 +359,8 @@ class SubscribedEvent:
                 # t = asyncio.create_task(s[1](copy(payload)))
                 # tasks.append(t)
                 # await s[1](copy(payload))
+                if s.predicate is not None and not s.predicate(payload):
+                    continue
                 if s.flags & SESType.HARDREF:
                     cb = s.ref
                 else:
@@ -380,6 +400,16 @@ class SubscribedEvent:
             logger.debug( f"Dispatch delay: {delay:.3f} ms {type(payload)}")
         return tasks
 
+    def _stamp_as_sent(self, payload: EventPayload):
+        if self._adjust_payload is not None:
+            self._adjust_payload(self, payload)
+        payload._event_time = time.time()
+        self._last_sent = payload
+
+    @property
+    def has_subscribers(self) -> bool:
+        return bool(self._subscribers)
+
     @property
     def last_sent(self):
         """
@@ -20,7 +20,13 @@ class EventPayload:
     create_time     if None, will use time.time()
     _sender         will be filled out by the Event.publish() method
     _event_time     will be filled out by the Event.publish() method
+
+    Subclasses may declare __slots__ for high-rate payloads,
+    as_json() includes slot attributes as well as those in __dict__
     """
+    __slots__ = ('_version', '_sender', 'arrival_time', 'create_time',
+                 '_event_time')
+
     _internal_only = False
 
     def __init__(self,
@@ -63,18 +69,30 @@ class EventPayload:
         They are translated to 'name', 'version', 'sender' and 'event_time'
         """
         # IntEnum gets JSON-ified as an int
-        work = {k: prep_for_json(v) for k, v in self.__dict__.items()
+        work = {k: prep_for_json(v) for k, v in self._attr_items()
                 if not k.startswith('_')}
         for key in ('version', 'event_time'):
-            try:
-                work[key] = self.__dict__['_' + key]
-            except KeyError:
-                work[key] = None
+            work[key] = getattr(self, '_' + key, None)
         work['sender'] = type(self._sender).__name__
         work['class'] = type(self).__name__
 
         return json.dumps(work)
 
+    def _attr_items(self):
+        """
+        (name, value) for the instance attributes, slots first
+        """
+        for cls in reversed(type(self).__mro__):
+            slots = cls.__dict__.get('__slots__', ())
+            if isinstance(slots, str):
+                slots = (slots,)
+            for name in slots:
+                try:
+                    yield name, getattr(self, name)
+                except AttributeError:
+                    pass  # Declared, but never assigned
+        yield from getattr(self, '__dict__', {}).items()
+
 
 class EventNotificationName (enum.Enum):
     """
@@ -487,7 +487,7 @@ class AcaiaGeneric (GenericScale):
         if self._heartbeat:
             await self._heartbeat.work.cancel()
             self._heartbeat = None
-        await super(AcaiaGeneric, self).disconnect(for_reconnect=for_reconnect)
+        await super(AcaiaGeneric, self).disconnect()
 
     async def display_on(self):
         pass
@@ -495,6 +495,10 @@ class AcaiaGeneric (GenericScale):
     async def display_off(self):
         pass
 
+    @property
+    def supports_display(self):
+        return False
+
     async def _tare_internal(self):
         await self._send_packet(FixedMessage.TARE.value)
 
@@ -711,12 +715,17 @@ class AcaiaGeneric (GenericScale):
 
                 # 6 bytes or more bytes before checksum
                 mantissa = message[5] + message[6] * 256 + message[7] * 65536
-                scale_by = 10 ** message[9]  # Production do this faster
-                if message[10] & 0x02:
-                    sign = -1
+                # message[9] is the number of decimal places
+                # Convert to centigrams in integers, without a float
+                decimals = message[9]
+                if decimals <= 2:
+                    weight_cg = mantissa * 10 ** (2 - decimals)
                 else:
-                    sign = 1
-                weight = sign * mantissa / scale_by
+                    scale_by = 10 ** (decimals - 2)
+                    weight_cg, remainder = divmod(mantissa, scale_by)
+                    weight_cg += 2 * remainder >= scale_by  # Round half up
+                if message[10] & 0x02:
+                    weight_cg = -weight_cg
 
                 if (message[10] & 0x01):  # Weight unsettled if & 0x01
                     other = '~'
@@ -733,7 +742,8 @@ class AcaiaGeneric (GenericScale):
                     unknown13 = message[13]
                     other = f"{other} {battery}% {unknown11}[11] {unknown13}[13]"
                     logger_notify.debug(
-                        f"0x0a length: {weight}g {other} {hex_logstr(message)}")
+                        f"0x0a length: {weight_cg / 100}g {other} "
+                        f"{hex_logstr(message)}")
 
                 elif length_byte == 0x0c:
                     # it is a status, weight notification, "long version"
@@ -765,15 +775,13 @@ class AcaiaGeneric (GenericScale):
                         f"0x{len(message) - 4:02x} bytes unexpected: "
                         f"{hex_logstr(message)}")
 
-                # asyncio.get_running_loop().create_task(
-                await self.event_weight_update.publish(
+                self._queue_weight_update(
                         ScaleWeightUpdate(
                             arrival_time=timestamp,
                             scale_time=self._scale_time_from_latest_arrival(
                                 timestamp),
-                            weight=weight
+                            weight_cg=weight_cg
                         ))
-                # )
 
             elif event_type == EventType.REPLY_06:
                 logger_notify.info(
@@ -49,7 +49,7 @@ class AtomaxSkaleII (GenericScale):
             self._task_button_press.cancel()
         except AttributeError:
             pass
-        await self._event_button_press.unsubscribe(
+        await self.event_button_press.unsubscribe(
             self._button_1_tare_subscriber_id)
         for attr in (
             '_write_gatt_char_response',
@@ -135,15 +135,16 @@ class AtomaxSkaleII (GenericScale):
         self._manufacturer_name = await self._bleak_client.read_gatt_char(
             Characteristic.MANUFACTURER_NAME.cuuid)
 
-    async def _weight_update_handler(self, sender, data):
+    def _weight_update_handler(self, sender, data):
 
         try:
             now = time.time()
 
+            # Reported in decigrams
             w1 = int.from_bytes(data[1:4], byteorder='little',
-                                signed=True) / 10.0
+                                signed=True) * 10
             w2 = int.from_bytes(data[5:8], byteorder='little',
-                                signed=True) / 10.0
+                                signed=True) * 10
             # if w1 == w2:
             #     print(f"{dt:8.6f} {w1}")
             # else:
@@ -151,11 +152,11 @@ class AtomaxSkaleII (GenericScale):
 
             self._update_scale_time_estimator(now)
 
-            await self.event_weight_update.publish(
+            self._queue_weight_update(
                 ScaleWeightUpdate(
                     arrival_time=now,
                     scale_time=self._scale_time_from_latest_arrival(now),
-                    weight=w1
+                    weight_cg=w1
                 ))
         except Exception as e:
             logger.exception(e)
@@ -175,7 +176,7 @@ class AtomaxSkaleII (GenericScale):
 
     async def _subscribe_button_press(self):
         self._button_1_tare_subscriber_id \
-            = await self._event_button_press.subscribe(
+            = await self.event_button_press.subscribe(
             self._button_press_subscriber)
         self._task_button_press = None
 
@@ -197,9 +198,8 @@ class Characteristic(enum.Enum):
 
     UNKNOWN = '0f050002-3225-44b1-b97d-d3274acb29de'  # R
 
-    @property
-    def cuuid(self):
-        return f"0000{self.value}-0000-1000-8000-00805f9b34fb"
+    def __init__(self, value):
+        self.cuuid = f"0000{value}-0000-1000-8000-00805f9b34fb"
 
 
 # These typically get written to CONFIGURATION_EF80
@@ -228,6 +228,5 @@ class Command(enum.Enum):
     FILTER_STRONG = b'\x09\x02'
     FILTER_STRONGER = b'\x09\x03'
 
-    @property
-    def cuuid(self):
-        return Characteristic.CONFIGURATION_EF80.cuuid
+    def __init__(self, value):
+        self.cuuid = Characteristic.CONFIGURATION_EF80.cuuid
@@ -10,7 +10,7 @@ Estimators to use with ScaleProcessor
 """
 
 from statistics import median
-from typing import Tuple, List
+from typing import List, Optional, Tuple
 
 import pyDE1
 from pyDE1.scale.processor import ScaleProcessor
@@ -43,7 +43,7 @@ class Estimator:
 
     Writes the value into scale_processor.target_attr
     Writes the time into scale_processor.target_attr_time
-    Assumes that scale_processor._history is a list
+    Reads scale_processor._window_*, lists copied from the history deques
 
     In contrast to other implementations, the time estimates
     include scale_delay and estimated_period/2
@@ -82,8 +82,8 @@ class Estimator:
 
     @_needed.setter
     def _needed(self, needed: int):
-        # Arguably this should grab _history_lock, but increases here
-        # should be "safe" and recoverable. Keep as non-async
+        # Resizing the history doesn't await,
+        # so "safe" against a concurrent update. Keep as non-async
         self._needed_internal = needed
         sp = self._scale_processor
         sp._history_max = max(needed, sp._history_max)
@@ -98,35 +98,60 @@ class CurrentWeight (Estimator):
         self._needed = 1
 
     def _estimate_inner(self):
-        val = self._scale_processor._history_weight[-1]
-        tval = self._scale_processor._history_time[-1]
+        val = self._scale_processor._window_weight[-1]
+        tval = self._scale_processor._window_time[-1]
         return val, tval
 
 
 class AverageFlow (Estimator):
+    """
+    The mean time of the window is kept as a running sum,
+    adding the newest and dropping the one that left the window.
+    It is re-summed if the window isn't a continuation of the last one
+    (such as after a reset) and periodically to limit rounding drift.
+    """
+
+    _RESUM_EVERY = 1000  # updates
 
     def __init__(self, scale_processor: ScaleProcessor,
                  target_attr: str,
                  samples: int):
         super(AverageFlow, self).__init__(scale_processor=scale_processor,
                                           target_attr=target_attr)
+        self._sum_time = 0.0
+        self._sum_time_last: Optional[float] = None
+        self._sum_time_count = 0
         self.samples = samples
 
     def _estimate_inner(self):
+        wt = self._scale_processor._window_time
+        ww = self._scale_processor._window_weight
         # time data is jittery, use the best estimate
         dt = (self.samples - 1) * self._scale_processor.scale.estimated_period
-        val = ((self._scale_processor._history_weight[-1]
-                - self._scale_processor._history_weight[-self.samples]) / dt)
+        val = (ww[-1] - ww[-self.samples]) / dt
         # (latest - dt/2) has a deviation of sigma + that of dt (small)
         # (latest + oldest)/2 has a deviation of sigma/sqrt(2) if independent
         # Following this, the average over the window should be even better
         if _USE_MEAN_FOR_TIME:
-            tval = mean(self._scale_processor._history_time[-self.samples:])
+            tval = self._mean_time(wt)
         else:
-            tval = (self._scale_processor._history_time[-self.samples]
-                    + self._scale_processor._history_time[-1]) / 2
+            tval = (wt[-self.samples] + wt[-1]) / 2
         return val, tval
 
+    def _mean_time(self, wt: List[float]) -> float:
+        n = self.samples
+        if (self._sum_time_last is not None
+                and len(wt) > n
+                and wt[-2] == self._sum_time_last
+                and self._sum_time_count < self._RESUM_EVERY):
+            self._sum_time += wt[-1] - wt[-(n + 1)]
+            self._sum_time_count += 1
+        else:
+            self._sum_time = sum(wt[-n:])
+            self._sum_time_count = 0
+        self._sum_time_last = wt[-1]
+        return self._sum_time / n
+
     @property
     def samples(self):
         return self._samples
@@ -135,6 +160,7 @@ class AverageFlow (Estimator):
     def samples(self, value):
         self._samples = value
         self._needed = value
+        self._sum_time_last = None
 
 
 class MedianWeight (Estimator):
@@ -146,12 +172,12 @@ class MedianWeight (Estimator):
         self.samples = samples
 
     def _estimate_inner(self):
-        val = median(self._scale_processor._history_weight[-self.samples:])
+        val = median(self._scale_processor._window_weight[-self.samples:])
         if _USE_MEAN_FOR_TIME:
-            tval = mean(self._scale_processor._history_time[-self.samples:])
+            tval = mean(self._scale_processor._window_time[-self.samples:])
         else:
-            tval = (self._scale_processor._history_time[-self.samples]
-                    + self._scale_processor._history_time[-1]) / 2
+            tval = (self._scale_processor._window_time[-self.samples]
+                    + self._scale_processor._window_time[-1]) / 2
         return val, tval
 
     @property
@@ -193,15 +219,15 @@ class MedianFlow (Estimator):
         p1 = -self.samples_for_medians
         p2 = -(1 + self.samples)
         p3 = -(self.samples + self.samples_for_medians)
-        m0 = median(self._scale_processor._history_weight[p1:p0])
-        m1 = median(self._scale_processor._history_weight[p3:p2])
+        m0 = median(self._scale_processor._window_weight[p1:p0])
+        m1 = median(self._scale_processor._window_weight[p3:p2])
         dt = (self.samples - 1) * self._scale_processor.scale.estimated_period
         val = (m0 - m1)/dt
         if _USE_MEAN_FOR_TIME:
-            tval = mean(self._scale_processor._history_time[p3:p0])
+            tval = mean(self._scale_processor._window_time[p3:p0])
         else:
-            tval = (self._scale_processor._history_time[p3]
-                    + self._scale_processor._history_time[p0]) / 2
+            tval = (self._scale_processor._window_time[p3]
+                    + self._scale_processor._window_time[p0]) / 2
         return val, tval
 
     @property
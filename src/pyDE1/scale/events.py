@@ -8,6 +8,8 @@ SPDX-License-Identifier: GPL-3.0-only
 Common events for scales
 """
 
+from typing import Optional
+
 from pyDE1.event_manager.payloads import EventPayload
 from pyDE1.event_manager.events import DeviceAvailability
 
@@ -15,21 +17,39 @@ from pyDE1.event_manager.events import DeviceAvailability
 class ScaleWeightUpdate(EventPayload):
     """
     See WeightAndFlowUpdate for API-visible class
+
+    Weight is carried as integer centigrams, as most scales report.
+    Pass weight_cg when the scale reports it that way, otherwise weight
+    in grams is rounded to the nearest centigram.
     """
+    __slots__ = ('scale_time', 'weight_cg')
+
     _internal_only = True
 
     def __init__(self,
                  arrival_time: float,
                  scale_time: float,
-                 weight: float, ):
+                 weight: Optional[float] = None,
+                 weight_cg: Optional[int] = None, ):
         super(ScaleWeightUpdate, self).__init__(arrival_time=arrival_time)
         self._version = "1.0.0"
         self.scale_time = scale_time
-        self.weight = weight
+        if weight_cg is None:
+            if weight is None:
+                raise TypeError(
+                    "ScaleWeightUpdate requires either weight or weight_cg")
+            weight_cg = round(weight * 100)
+        self.weight_cg = weight_cg
+
+    @property
+    def weight(self) -> float:
+        return self.weight_cg / 100
 
 
 class ScaleButtonPress(EventPayload):
 
+    __slots__ = ('button',)
+
     def __init__(self, arrival_time: float, button: int):
         super(ScaleButtonPress, self).__init__(arrival_time=arrival_time)
         self._version = "1.0.0"  # Major version incremented on breaking change
@@ -38,6 +58,8 @@ class ScaleButtonPress(EventPayload):
 
 class ScaleTareSeen(EventPayload):
 
+    __slots__ = ()
+
     def __init__(self, arrival_time: float):
         super(ScaleTareSeen, self).__init__(arrival_time=arrival_time)
         self._version = "1.0.0"  # Major version incremented on breaking change
@@ -46,7 +68,16 @@ class ScaleTareSeen(EventPayload):
 class WeightAndFlowUpdate(EventPayload):
     """
     On ScaleProcessor at this time
+
+    ScaleProcessor reuses instances from a small pool,
+    subscribers should copy what they need rather than keep the payload
     """
+    __slots__ = ('scale_time',
+                 'current_weight', 'current_weight_time',
+                 'average_flow', 'average_flow_time',
+                 'median_weight', 'median_weight_time',
+                 'median_flow', 'median_flow_time')
+
     # Right now, this doesn't capture any DE1 data, such as state
     # I'm not sure that it needs to with this framework
     def __init__(self, arrival_time: float,
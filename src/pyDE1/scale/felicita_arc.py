@@ -12,6 +12,9 @@ SPDX-License-Identifier: GPL-3.0-only
 
 import enum
 import time
+from typing import Optional
+
+from bleak.backends.characteristic import BleakGATTCharacteristic
 
 import pyDE1
 from pyDE1.scale.events import ScaleWeightUpdate
@@ -37,21 +40,33 @@ class FelicitaArc (GenericScale):
         self._tare_timeout = 1.0  # seconds until considered coincidence
         self._tare_threshold = 0.05  # grams, within this, considered "at zero"
 
+        # Resolved once per connection in start_sending_weight_updates()
+        self._main_char: Optional[BleakGATTCharacteristic] = None
+
     async def _adopt_class(self):
         self._adopt_sync()
 
     async def _leave_class(self):
-        pass   # Nothing other than common attributes set
+        for attr in (
+            '_main_char',
+        ):
+            delattr(self, attr)
+
+    def _prepare_for_connection(self):
+        # The services, and so the characteristic, change with the connection
+        self._main_char = None
 
     async def start_sending_weight_updates(self):
+        self._main_char = self._bleak_client.services.get_characteristic(
+            Characteristic.MAIN.cuuid)
         await self._bleak_client.start_notify(
-            Characteristic.MAIN.cuuid,
-            self._weight_update_hander)
+            self._main_char or Characteristic.MAIN.cuuid,
+            self._weight_update_handler)
         logger.info("Sending weight updates")
 
     async def stop_sending_weight_updates(self):
         await self._bleak_client.stop_notify(
-            Characteristic.MAIN.cuuid)
+            self._main_char or Characteristic.MAIN.cuuid)
         logger.info("Stopped weight updates")
 
     def is_sending_weight_updates(self):
@@ -80,46 +95,44 @@ class FelicitaArc (GenericScale):
     def supports_button_press(self):
         return False
 
+    @property
+    def supports_display(self):
+        return False
+
     async def send_command(self, command: "Command"):
         await self._bleak_client.write_gatt_char(
-            command.cuuid,
+            self._main_char or command.cuuid,
             command.value,
             response=self._write_gatt_char_response)
 
-    async def _weight_update_handler(self, sender, data):
-
-        try:
-            now = time.time()
-            if len(data) < 9:
-                return
+    def _weight_update_handler(self, sender, data):
 
-            # data[0:2] is a header
-            sign = data[2]
-            weight = int(data[3:]) / 100.0
+        now = time.time()
+        if len(data) < 9:
+            return
 
-            if chr(sign) == '-':
-                weight *= -1
+        # data[0:2] is a header, data[2] is the sign
+        weight_cg = int(data[3:])  # Reported in centigrams
+        if data[2] == 0x2D:  # b'-'
+            weight_cg = -weight_cg
 
-            self._update_scale_time_estimator(now)
+        self._update_scale_time_estimator(now)
 
-            await self.event_weight_update.publish(
-                ScaleWeightUpdate(
-                    arrival_time=now,
-                    scale_time=self._scale_time_from_latest_arrival(now),
-                    weight=weight
-                ))
-        except Exception as e:
-            logger.exception(e)
-            raise e
+        self._queue_weight_update(
+            ScaleWeightUpdate(
+                arrival_time=now,
+                scale_time=self._scale_time_from_latest_arrival(now),
+                weight_cg=weight_cg
+            ))
 
 
 class Characteristic(enum.Enum):
 
     MAIN =    'FFE1'  # RWN
 
-    @property
-    def cuuid(self):
-        return f"0000ffe1-0000-1000-8000-00805f9b34fb"
+    def __init__(self, value):
+        # Resolved once, here, rather than on every access
+        self.cuuid = f"0000{value.lower()}-0000-1000-8000-00805f9b34fb"
 
 
 class Command(enum.Enum):
@@ -130,6 +143,5 @@ class Command(enum.Enum):
     TIMER_START = b'\x52'
     TIMER_STOP = b'\x53'
 
-    @property
-    def cuuid(self):
-        return Characteristic.MAIN.cuuid
+    def __init__(self, value):
+        self.cuuid = Characteristic.MAIN.cuuid
@@ -7,15 +7,18 @@ SPDX-License-Identifier: GPL-3.0-only
 """
 
 import asyncio
+import collections
+import functools
 import pprint
 import time
 import warnings
-from typing import Optional, Union
+from typing import Deque, Optional, Union
 
 import aiosqlite
 from bleak.backends.device import BLEDevice
 
 import pyDE1
+import pyDE1.task_logger
 from pyDE1.bledev.managed_bleak_device import (
     ManagedBleakDevice, ClassChanger, class_changer_generic_class,
 )
@@ -36,6 +39,13 @@ logger = pyDE1.getLogger('Scale')
 # Used for class selection and for BLE detection and filtering
 _prefix_to_class = dict()
 
+# Constant text so sqlite3's per-connection statement cache is hit
+_SQL_PERSIST_PERIOD = "INSERT OR REPLACE INTO persist_hkv " \
+                      "(header, key, value) " \
+                      "VALUES ('scale.period', ?, ?)"
+_SQL_RESTORE_PERIOD = "SELECT value FROM persist_hkv " \
+                      "WHERE header = 'scale.period' AND key = ?"
+
 
 def register_scale_class(cls: 'GenericScale'):
     # logger.warning("This warning doesn't appear")
@@ -55,6 +65,7 @@ def register_scale_class(cls: 'GenericScale'):
         _prefix_to_class[prefix] = cls
         if prefix not in (None, ''):
             RegisteredPrefixes.add_to_role(prefix, DeviceRole.SCALE)
+    _prefix_scan.cache_clear()
     return cls
 
 
@@ -69,15 +80,25 @@ def prefix_to_class(prefix: Optional[str]):
             raise DE1RuntimeError(
                 "Missing empty-string key in _prefix_to_class: "
                 f"{_prefix_to_class}")
-        for key in _prefix_to_class.keys():
-            if key != '' and prefix.startswith(key):
-                cls = _prefix_to_class[key]
+        cls = _prefix_scan(prefix)
     if cls is None:
         raise DE1UnsupportedDeviceError(
             f"No recognized scale registered for '{prefix}'")
     return cls
 
 
+@functools.lru_cache(maxsize=128)
+def _prefix_scan(name: str):
+    """
+    BLE names repeat over reconnects and address changes, so cache the scan.
+    The longest registered prefix wins. Cleared by register_scale_class()
+    """
+    for key in sorted(_prefix_to_class.keys(), key=len, reverse=True):
+        if key != '' and name.startswith(key):
+            return _prefix_to_class[key]
+    return None
+
+
 # TODO: Experimentaly confirm that weight and mass-flow estimates
 #       are reasonably time aligned - NB: DE1.fall_time
 
@@ -105,17 +126,40 @@ class GenericScale (ClassChanger, ManagedBleakDevice):
         self.logger = pyDE1.getLogger('Scale.Generic')
         super(GenericScale, self).__init__()
 
-        self._event_weight_update: SubscribedEvent = SubscribedEvent(self)
-        self._event_button_press: SubscribedEvent = SubscribedEvent(self)
-        self._event_tare_seen: SubscribedEvent = SubscribedEvent(self)
+        # Plain attributes, rather than properties, as used per update
+        self.event_weight_update: SubscribedEvent = SubscribedEvent(self)
+        self.event_button_press: SubscribedEvent = SubscribedEvent(self)
+        self.event_tare_seen: SubscribedEvent = SubscribedEvent(self)
         self._event_scale_changed: SubscribedEvent = SubscribedEvent(self)
 
+        # Notification handlers only append here, see _weight_update_pump()
+        # If the pump falls behind, the oldest updates are dropped
+        self._weight_update_ring: Deque[ScaleWeightUpdate] \
+            = collections.deque(maxlen=64)
+        self._weight_update_ready = asyncio.Event()
+        self._weight_update_pump_task: Optional[asyncio.Task] = None
+        self._weight_updates_dropped = 0
+        self._weight_update_drop_logged = float('-inf')  # time.monotonic()
+
+        # Clears _tare_requested if no tare is seen, see tare()
+        self._tare_expire_handle: Optional[asyncio.TimerHandle] = None
+
+        # At most one tare task from _self_callback() at a time
+        self._hold_at_tare_inflight = False
+
+        # Opened on first use while connected, closed on release()
+        # See _get_db()
+        self._db: Optional[aiosqlite.Connection] = None
+        self._db_lock = asyncio.Lock()
+        self._db_enabled = False
+
         self._adopt_sync()
         self._period_estimator = PeriodEstimator(self)
 
-        # Don't need to await this on instantiation
-        asyncio.get_event_loop().create_task(
-            self._event_weight_update.subscribe(self._self_callback))
+        # Subscribed on first connection, so nothing is scheduled here
+        # and a scale can be created without a running loop
+        # The subscription survives class changes and reconnects
+        self._self_callback_subscribed = False
 
     def _adopt_sync(self):
         """
@@ -123,7 +167,8 @@ class GenericScale (ClassChanger, ManagedBleakDevice):
         """
         self._name: Optional[str] = None
 
-        self._adjust_name_send_scale_change()
+        # Not published from here, as called from __init__
+        self._adjust_name()
 
         # These are often model-specific, override in subclass init
         self._nominal_period = 0.1  # seconds per sample
@@ -141,7 +186,9 @@ class GenericScale (ClassChanger, ManagedBleakDevice):
 
         self._estimated_period = self._nominal_period
         self._last_weight_update_received = 0
-        self._last_tare_request_sent = 0
+        self._last_tare_request_sent = 0  # time.time(), vs. arrival_time
+        # time.monotonic(), only for the request interval
+        self._last_tare_request_monotonic = float('-inf')
 
         self._tare_requested = False
 
@@ -152,6 +199,7 @@ class GenericScale (ClassChanger, ManagedBleakDevice):
 
     async def _adopt_class(self):
         self._adopt_sync()
+        self._adjust_name_send_scale_change()
 
     @property
     def event_scale_changed(self):
@@ -161,7 +209,7 @@ class GenericScale (ClassChanger, ManagedBleakDevice):
     def sensor_lag(self):
         return self._sensor_lag
 
-    def _adjust_name_send_scale_change(self):
+    def _adjust_name(self):
         # logger.debug(f"Adjusting name {logger.findCaller(stacklevel=2)}")
         try:
             ble_name = self._bleak_client._backend._device_info['Name']
@@ -171,13 +219,28 @@ class GenericScale (ClassChanger, ManagedBleakDevice):
         self._name = f"{class_name}: {ble_name}"
         self.logger = pyDE1.getLogger(f'Scale.{class_name}')
         self._bleak_client.logger = self.logger.getChild('Client')
+
+    def _adjust_name_send_scale_change(self):
+        self._adjust_name()
         sc = ScaleChange(arrival_time=time.time(),
                          state=self.availability_state,
                          id=self.address,
                          name=self.name)
         asyncio.create_task(self._event_scale_changed.publish(sc))
 
+    async def _subscribe_self_callback(self):
+        """
+        First, so that the estimated period and tare state are updated
+        before any other subscriber, such as ScaleProcessor, sees the update
+        """
+        if not self._self_callback_subscribed:
+            self._self_callback_subscribed = True
+            await self.event_weight_update.subscribe(self._self_callback,
+                                                     first=True)
+
     async def _initialize_after_connection(self, hold_ready=False):
+        await self._subscribe_self_callback()
+        self._db_enabled = True
         # Check that this is the right class to service the connected device
         self._adjust_name_send_scale_change()
         ble_name = self._bleak_client._backend._device_info['Name']
@@ -188,7 +251,9 @@ class GenericScale (ClassChanger, ManagedBleakDevice):
                     self._name, type(self), cls))
             await self._change_class(cls)
             self._adjust_name_send_scale_change()
-        await self.display_on()
+        self._start_weight_update_pump()
+        if self.supports_display:
+            await self.display_on()
         await self.start_sending_weight_updates()
         if self.supports_button_press:
             await self.start_sending_button_updates()
@@ -214,6 +279,13 @@ class GenericScale (ClassChanger, ManagedBleakDevice):
     async def disconnect(self):
         await self.release()
 
+    async def release(self, timeout: Optional[float] = None) -> bool:
+        retval = await super(GenericScale, self).release(timeout=timeout)
+        # Close first, the pump may be the task running release()
+        await self._close_db()
+        await self._stop_weight_update_pump()
+        return retval
+
     async def start_sending_weight_updates(self):
         raise DE1NotConnectedError
 
@@ -228,6 +300,14 @@ class GenericScale (ClassChanger, ManagedBleakDevice):
     def supports_button_press(self):
         return False
 
+    @property
+    def supports_display(self):
+        """
+        False for scales where display_on() and display_off() are no-ops,
+        so callers can skip them
+        """
+        return True
+
     async def start_sending_button_updates(self):
         raise DE1NotConnectedError
 
@@ -242,11 +322,17 @@ class GenericScale (ClassChanger, ManagedBleakDevice):
         It doesn't make sense to hammer it as it will take
         at least one reporting period to "see" the tare
         """
-        dt = time.time() - self._last_tare_request_sent
+        dt = time.monotonic() - self._last_tare_request_monotonic
         if dt > self._minimum_tare_request_interval:
             await self._tare_internal()
+            self._last_tare_request_monotonic = time.monotonic()
             self._last_tare_request_sent = time.time()
             self._tare_requested = True
+            # Expire with a timer, rather than checking every weight update
+            if self._tare_expire_handle is not None:
+                self._tare_expire_handle.cancel()
+            self._tare_expire_handle = asyncio.get_running_loop().call_later(
+                self._tare_timeout, self._expire_tare_request)
             logger.info(f"Tare request sent")
         else:
             logger.info(
@@ -256,6 +342,66 @@ class GenericScale (ClassChanger, ManagedBleakDevice):
     async def _tare_internal(self):
         raise DE1NotConnectedError
 
+    def _queue_weight_update(self, swu: ScaleWeightUpdate):
+        """
+        For use by notification handlers, returns without awaiting
+        """
+        ring = self._weight_update_ring
+        if len(ring) == ring.maxlen:
+            self._weight_updates_dropped += 1
+            now = time.monotonic()
+            if now - self._weight_update_drop_logged > 10:
+                self._weight_update_drop_logged = now
+                self.logger.warning(
+                    "Weight-update pump falling behind, "
+                    f"{self._weight_updates_dropped} updates dropped so far")
+        ring.append(swu)
+        self._weight_update_ready.set()
+
+    def _start_weight_update_pump(self):
+        if (self._weight_update_pump_task is None
+                or self._weight_update_pump_task.done()):
+            self._weight_update_pump_task = pyDE1.task_logger.create_task(
+                self._weight_update_pump(),
+                logger=self.logger,
+                message="Exception in weight-update pump")
+
+    async def _stop_weight_update_pump(self):
+        """
+        Updates still queued are discarded, they are stale by the time
+        of the next connection
+        """
+        task = self._weight_update_pump_task
+        self._weight_update_pump_task = None
+        self._weight_update_ring.clear()
+        if task is None or task.done():
+            return
+        if task is asyncio.current_task():
+            # A subscriber requested the release, don't cancel the caller
+            # The pump exits once it returns, see _weight_update_pump()
+            return
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    async def _weight_update_pump(self):
+        """
+        Publish the queued weight updates, in order of arrival
+        """
+        ring = self._weight_update_ring
+        # No longer the current pump once stopped, see release()
+        me = asyncio.current_task()
+        while self._weight_update_pump_task is me:
+            await self._weight_update_ready.wait()
+            self._weight_update_ready.clear()
+            while ring and self._weight_update_pump_task is me:
+                try:
+                    await self.event_weight_update.publish(ring.popleft())
+                except Exception as e:
+                    self.logger.exception(e)
+
     async def current_weight(self) -> Optional[float]:
         """
         Intended to request an in-the-moment read from the scale
@@ -276,6 +422,8 @@ class GenericScale (ClassChanger, ManagedBleakDevice):
             await self.tare()
 
     async def display_bool(self, on: bool):
+        if not self.supports_display:
+            return
         if on:
             await self.display_on()
         else:
@@ -285,18 +433,6 @@ class GenericScale (ClassChanger, ManagedBleakDevice):
     def estimated_period(self):
         return self._estimated_period
 
-    @property
-    def event_weight_update(self):
-        return self._event_weight_update
-
-    @property
-    def event_button_press(self):
-        return self._event_button_press
-
-    @property
-    def event_tare_seen(self):
-        return self._event_tare_seen
-
     async def change_address(self, address: Optional[Union[BLEDevice, str]]):
         """
         Change address, including changing type if passed a BLEDevice
@@ -343,31 +479,58 @@ class GenericScale (ClassChanger, ManagedBleakDevice):
         pass
 
     async def _self_callback(self, swu: ScaleWeightUpdate) -> None:
-        dt = swu.arrival_time - self._last_weight_update_received
-        self._last_weight_update_received = swu.arrival_time
+        arrival_time = swu.arrival_time
+        abs_weight_cg = abs(swu.weight_cg)
 
-        # TODO: Run profiler and evaluate if creating a task
-        #       is consuming too much time
+        dt = arrival_time - self._last_weight_update_received
+        self._last_weight_update_received = arrival_time
 
-        asyncio.create_task(
-            self._period_estimator.process_arrival(dt))
+        self._period_estimator.process_arrival(dt)
 
-        if self._tare_requested:
-            dt = swu.arrival_time - self._last_tare_request_sent
-            if dt > self._tare_timeout:
-                self._tare_requested = False
-                logger.error(f"No tare seen after {dt:0.03f} seconds")
-            elif abs(swu.weight) < self._tare_threshold:
-                self._tare_requested = False
-                await self.event_tare_seen.publish(
-                    ScaleTareSeen(swu.arrival_time)
-                )
-                logger.info(f"Tare seen after {dt:0.03f} seconds")
+        if (self._tare_requested
+                and abs_weight_cg < self._tare_threshold_cg):
+            self._tare_requested = False
+            self._tare_expire_handle.cancel()
+            self._tare_expire_handle = None
+            await self.event_tare_seen.publish(
+                ScaleTareSeen(arrival_time)
+            )
+            dt = arrival_time - self._last_tare_request_sent
+            logger.info(f"Tare seen after {dt:0.03f} seconds")
 
         if self.hold_at_tare:
-            if abs(swu.weight) > self._tare_threshold:
-                # Timing will be checked in scale.tare()
-                await self.tare()
+            if (abs_weight_cg > self._tare_threshold_cg
+                    and not self._hold_at_tare_inflight
+                    and (time.monotonic() - self._last_tare_request_monotonic
+                         > self._minimum_tare_request_interval)):
+                # Same interval test as tare(), so no task is created
+                # for requests that would be skipped as too soon
+                # Don't hold up weight updates for the BLE write
+                self._hold_at_tare_inflight = True
+                t = pyDE1.task_logger.create_task(
+                    self.tare(),
+                    logger=self.logger,
+                    message="Exception in hold-at-tare request")
+                t.add_done_callback(self._hold_at_tare_done)
+
+    def _expire_tare_request(self):
+        self._tare_expire_handle = None
+        if self._tare_requested:
+            self._tare_requested = False
+            dt = time.time() - self._last_tare_request_sent
+            logger.error(f"No tare seen after {dt:0.03f} seconds")
+
+    def _hold_at_tare_done(self, task: asyncio.Task):
+        self._hold_at_tare_inflight = False
+
+    @property
+    def _tare_threshold(self) -> float:
+        return self._tare_threshold_cg / 100
+
+    @_tare_threshold.setter
+    def _tare_threshold(self, grams: float):
+        # Kept in centigrams to compare directly with weight_cg
+        self._tare_threshold_cg = round(grams * 100)
 
     @property
     def nominal_period(self):
@@ -378,45 +541,62 @@ class GenericScale (ClassChanger, ManagedBleakDevice):
         self._nominal_period = value
         self._period_estimator.reset(value)
 
+    async def _get_db(self) -> Optional[aiosqlite.Connection]:
+        """
+        The period is persisted every few minutes and restored on connect,
+        keep one connection for that rather than opening one each time.
+        WAL mode is already set persistently by the schema.
+
+        Returns None between release() and the next connection, so that
+        a late persist doesn't reopen a connection nothing would close.
+        aiosqlite's thread isn't a daemon and would hold up exit.
+        """
+        async with self._db_lock:
+            if self._db is None and self._db_enabled:
+                self._db = await aiosqlite.connect(config.database.FILENAME)
+            return self._db
+
+    async def _close_db(self):
+        async with self._db_lock:
+            self._db_enabled = False
+            if self._db is not None:
+                db = self._db
+                self._db = None
+                await db.close()
+
     async def _persist_period_to_db(self):
         if not self.address:
             raise DE1NoAddressError(
                 "Can't persist scale period without a scale address")
-        async with aiosqlite.connect(config.database.FILENAME) as db:
-            sql = "INSERT OR REPLACE INTO persist_hkv " \
-                  "(header, key, value) " \
-                  "VALUES " \
-                  "(:header, :key, :value) "
-            await db.execute(sql, {
-                'header': 'scale.period',
-                'key': self.address,
-                'value': self.estimated_period,
-            })
-            await db.commit()
+        db = await self._get_db()
+        if db is None:
+            logger.info("Scale released, not persisting period")
+            return
+        await db.execute(_SQL_PERSIST_PERIOD,
+                         (self.address, self.estimated_period))
+        await db.commit()
 
     async def _restore_period_from_db(self):
         if not self.address:
             raise DE1NoAddressError(
                 "Can't restore scale period without a scale address")
-        async with aiosqlite.connect(config.database.FILENAME) as db:
-            sql = "SELECT value FROM persist_hkv " \
-                  "WHERE header = :header AND key = :key"
-            cur = await db.execute(sql, {
-                'header': 'scale.period',
-                'key': self.address,
-            })
+        db = await self._get_db()
+        if db is None:
+            logger.info("Scale released, not restoring period")
+            return
+        async with db.execute(_SQL_RESTORE_PERIOD, (self.address,)) as cur:
             row = await cur.fetchone()
-            if row and row[0]:
-                val = float(row[0])
-                logger.info(
-                    "Loading scale-period estimate of "
-                    f"{val:.5f} from database")
-                self._estimated_period = val
-                self._period_estimator.reset(val)
-            else:
-                logger.info(
-                    "No previous scale-period estimate for "
-                    f"{self.address} found")
+        if row and row[0]:
+            val = float(row[0])
+            logger.info(
+                "Loading scale-period estimate of "
+                f"{val:.5f} from database")
+            self._estimated_period = val
+            self._period_estimator.reset(val)
+        else:
+            logger.info(
+                "No previous scale-period estimate for "
+                f"{self.address} found")
 
     # For API
     @property
@@ -455,6 +635,9 @@ class PeriodEstimator:
     Try 500 ms to be reasonable.
     """
 
+    __slots__ = ('_scale', '_k', '_ma', '_too_long',
+                 '_persist_every_n', '_n_counter')
+
     def __init__(self, my_scale):
 
         # TODO: How to update this PeriodEstimator for subclass changes?
@@ -472,16 +655,21 @@ class PeriodEstimator:
         self._ma = nominal_period
         self._scale._estimated_period = nominal_period
 
-    async def process_arrival(self, delta_arrival_time: float):
-
-        if delta_arrival_time < self._too_long:
-            self._ma = ((1 - self._k) * self._ma) \
-                       + (self._k * delta_arrival_time)
-            self._scale._estimated_period = self._ma
-            self._n_counter += 1
-            if self._n_counter >= self._persist_every_n:
-                self._n_counter = 0
-                logger.getChild('Period').debug(f"Persisting {self._ma}")
-                await self._scale._persist_period_to_db()
+    def process_arrival(self, delta_arrival_time: float):
+        """
+        Called on every weight update, so kept synchronous
+        Gaps of _too_long or more are ignored (keep is 0)
+        """
+        keep = delta_arrival_time < self._too_long
+        self._ma += keep * self._k * (delta_arrival_time - self._ma)
+        self._scale._estimated_period = self._ma
+        self._n_counter += keep
+        if self._n_counter >= self._persist_every_n:
+            self._n_counter = 0
+            logger.getChild('Period').debug(f"Persisting {self._ma}")
+            pyDE1.task_logger.create_task(
+                self._scale._persist_period_to_db(),
+                logger=logger,
+                message="Exception persisting scale period")
 
 
@@ -7,11 +7,13 @@ SPDX-License-Identifier: GPL-3.0-only
 """
 
 import asyncio
+import collections
 import time
-from typing import Optional, List, Callable
+from typing import Deque, Optional, List, Callable
 from uuid import UUID
 
 import pyDE1
+import pyDE1.task_logger
 from pyDE1.config import config
 from pyDE1.de1 import DE1
 from pyDE1.de1.c_api import API_MachineStates
@@ -25,7 +27,7 @@ from pyDE1.exceptions import DE1NoAddressError, DE1APIValueError
 from pyDE1.scale.generic_scale import GenericScale
 
 from pyDE1.scale.events import (
-    ScaleWeightUpdate, ScaleTareSeen, WeightAndFlowUpdate
+    ScaleWeightUpdate, ScaleTareSeen, WeightAndFlowUpdate, ScaleChange
 )
 from pyDE1.scanner import (
     find_first_matching,
@@ -35,6 +37,16 @@ from pyDE1.singleton import Singleton
 
 logger = pyDE1.getLogger('Scale.Processor')
 
+# Detect a gap in reporting being "too long"
+# (typically from a disconnect/reconnect)
+# A skip of three at 150 ms per update with the Skale II
+_TOO_LONG = 0.8  # seconds
+
+
+def _involves_sleep(su: StateUpdate) -> bool:
+    # Only transitions into or out of Sleep are acted on
+    return API_MachineStates.Sleep in (su.state, su.previous_state)
+
 
 class ScaleProcessor (Singleton):
     """
@@ -59,11 +71,25 @@ class ScaleProcessor (Singleton):
         self._scale_tare_seen_id: Optional[UUID] = None
         self._scale_changed_id: Optional[UUID] = None
         self._state_update_id: Optional[UUID] = None
+        # Bounded, so appending drops the oldest sample
+        self._history_time: Deque[float] = collections.deque()
+        self._history_weight: Deque[float] = collections.deque()
         self._history_max = 10  # Will be extended if needed by Estimator
-        self._history_time: List[float] = []
-        self._history_weight: List[float] = []
-        self._history_lock = asyncio.Lock()
-        # set_scale needs _history_lock
+        # Contiguous copies of the history, taken once per update
+        # so that each Estimator can slice them without copying the deques
+        self._window_time: List[float] = []
+        self._window_weight: List[float] = []
+        # Updating the history doesn't await, so needs no lock.
+        # Estimating and publishing is done by _publish_pending(), once per
+        # wake, for the latest update. Those that arrived since its last
+        # pass are already in the history, so that one pass covers them.
+        self._pending_swu: Optional[ScaleWeightUpdate] = None
+        self._pending_ready = asyncio.Event()
+        # One is in flight while the other is filled
+        self._update_pool = tuple(
+            WeightAndFlowUpdate(0, 0, 0, 0, 0, 0, 0, 0, 0, 0)
+            for _ in range(2))
+        self._update_pool_index = 0
         self._event_weight_and_flow_update = SubscribedEvent(self)
 
         self.CURRENT_WEIGHT_MAX_AGE = 1.0  # seconds, else return None
@@ -72,6 +98,8 @@ class ScaleProcessor (Singleton):
         # (good practice to explicily declare anyways)
         self._current_weight: float = 0
         self._current_weight_time: float = 0
+        # Set with each estimate, so reads don't need to do the arithmetic
+        self._current_weight_valid_until: float = 0
         self._average_flow: float = 0
         self._average_flow_time: float = 0
         self._median_weight: float = 0
@@ -84,37 +112,39 @@ class ScaleProcessor (Singleton):
             MedianWeight(self, '_median_weight', 11),
             MedianFlow(self, '_median_flow', 11, 5),
         ]
-
-        asyncio.get_running_loop().create_task(self.wire_scale())
+        # Bound once, called on every weight update
+        self._estimate_fns = tuple(e.estimate for e in self._estimators)
+
+        # Runs in the background; task_logger reports any failure
+        pyDE1.task_logger.create_task(
+            self.wire_scale(),
+            logger=logger,
+            message="Exception wiring scale to ScaleProcessor")
+        self._publish_pending_task = pyDE1.task_logger.create_task(
+            self._publish_pending(),
+            logger=logger,
+            message="Exception publishing weight and flow")
 
     @property
     def scale(self):
         return self._scale
 
     async def wire_scale(self):
-        (
-            self._scale_weight_update_id,
-            self._scale_tare_seen_id,
-            self._scale_changed_id,
-            self._state_update_id,
-
-        ) = await asyncio.gather(
-            self._scale.event_weight_update.subscribe(
-                self._weight_update_subscriber),
-
-            self._scale.event_tare_seen.subscribe(
-                self._tare_seen_subscriber),
-
-            self._scale.event_scale_changed.subscribe(
-                self._reset()
-            ),
-
-            DE1().event_state_update.subscribe(
-                self._state_update_subscriber),
-
-            return_exceptions=True
-        )
-        await self._reset()  # New scale, toss old history
+        # In-process subscriptions, in order, nothing to gain from gather()
+        self._scale_weight_update_id = \
+            await self._scale.event_weight_update.subscribe(
+                self._weight_update_subscriber)
+        self._scale_tare_seen_id = \
+            await self._scale.event_tare_seen.subscribe(
+                self._tare_seen_subscriber)
+        self._scale_changed_id = \
+            await self._scale.event_scale_changed.subscribe(
+                self._scale_changed_subscriber)
+        self._state_update_id = \
+            await DE1().event_state_update.subscribe(
+                self._state_update_subscriber,
+                predicate=_involves_sleep)
+        self._reset_sync()  # New scale, toss old history
 
     # Provide "null-safe" methods for API
 
@@ -164,8 +194,8 @@ class ScaleProcessor (Singleton):
 
     @property
     def current_weight(self) -> Optional[float]:
-        if (time.time() - self._current_weight_time
-                < self.CURRENT_WEIGHT_MAX_AGE):
+        # Wall clock, as _current_weight_time is a scale_time
+        if time.time() < self._current_weight_valid_until:
             return self._current_weight
         else:
             return None
@@ -207,15 +237,28 @@ class ScaleProcessor (Singleton):
     def event_weight_and_flow_update(self):
         return self._event_weight_and_flow_update
 
-    async def _reset(self):
-        async with self._history_lock:
-            self._reset_have_lock()
+    def _reset_sync(self):
+        self._history_time.clear()
+        self._history_weight.clear()
+        # Any pending update may be pre-tare
+        self._pending_swu = None
 
-    def _reset_have_lock(self):
-        self._history_time = []
-        self._history_weight = []
-        # TODO: Perhaps should clear any pending updates
-        #       as they may be pre-tare
+    @property
+    def _history_max(self):
+        return self._history_time.maxlen
+
+    @_history_max.setter
+    def _history_max(self, value: int):
+        self._resize_history(value)
+
+    def _resize_history(self, n: int):
+        """
+        Rebuild the history deques with a new bound, keeping the most
+        recent samples. Not async, no await between the two.
+        """
+        self._history_time = collections.deque(self._history_time, maxlen=n)
+        self._history_weight = collections.deque(self._history_weight,
+                                                 maxlen=n)
 
     @property
     def _history_available(self):
@@ -223,58 +266,83 @@ class ScaleProcessor (Singleton):
         return min(len(self._history_weight), len(self._history_time))
 
     async def _tare_seen_subscriber(self, sts: ScaleTareSeen):
-        await self._reset()
+        self._reset_sync()
+
+    async def _scale_changed_subscriber(self, sc: ScaleChange):
+        self._reset_sync()
 
     async def _weight_update_subscriber(self, swu: ScaleWeightUpdate):
-        # TODO: This has the potential to get really messy
-        #       Make sure this doesn't block other things
         # The Skale can return multiple updates in milliseconds
-        # Is there any guarantee that they will be processed in order?
-        # "Acquiring a lock is fair: the coroutine that proceeds
-        #  will be the first coroutine that started waiting on the lock."
-        async with self._history_lock:
-            # Detect a gap in reporting being "too long"
-            # (typically from a disconnect/reconnect)
-            # A skip of three at 150 ms per update with the Skale II
-            TOO_LONG = 0.8 # seconds
+        # They are added to the history in the order they are published
+        # A burst results in one estimate, see _publish_pending()
+        if not self._update_history(swu):
+            return
+        self._pending_swu = swu
+        self._pending_ready.set()
+
+    async def _publish_pending(self):
+        """
+        Estimate and publish for the latest update, once per wake
+        """
+        while True:
+            await self._pending_ready.wait()
+            self._pending_ready.clear()
+            swu = self._pending_swu
+            if swu is None:
+                # History was reset since the wake-up
+                continue
+            self._pending_swu = None
             try:
-                if ((dt := swu.scale_time
-                           - self._history_time[-1]) > TOO_LONG):
-                    logger.warning(
-                        "Resetting scale due to gap in reports: "
-                        f"{dt:0.3f} > {TOO_LONG} s")
-                    self._reset_have_lock()
-                    return
-            except IndexError:
-                pass  # (No elements in the history list)
-            self._history_time.append(swu.scale_time)
-            self._history_weight.append(swu.weight)
-            # Unlikely, but possibly the case that history_max shrunk
-            while len(self._history_time) \
-                    > self._history_max:
-                self._history_time.pop(0)
-            while len(self._history_weight) \
-                    > self._history_max:
-                self._history_weight.pop(0)
-
-            # There's nothing here really parallelizable
-            for estimator in self._estimators:
-                estimator.estimate()
-
-            await self._event_weight_and_flow_update.publish(
-                WeightAndFlowUpdate(
-                    arrival_time=swu.arrival_time,
-                    scale_time=swu.scale_time,
-                    current_weight=self._current_weight,
-                    current_weight_time=self._current_weight_time,
-                    average_flow=self._average_flow,
-                    average_flow_time=self._average_flow_time,
-                    median_weight=self._median_weight,
-                    median_weight_time=self._median_weight_time,
-                    median_flow=self._median_flow,
-                    median_flow_time=self._median_flow_time,
-                )
-            )
+                await self._event_weight_and_flow_update.publish(
+                    self._estimate(swu))
+            except Exception as e:
+                logger.exception(e)
+
+    def _update_history(self, swu: ScaleWeightUpdate) -> bool:
+        """
+        Returns False if the history was reset rather than extended
+        """
+        # Bound once, _resize_history() may replace the deques between calls
+        history_time = self._history_time
+        history_weight = self._history_weight
+        if (history_time
+                and (dt := swu.scale_time - history_time[-1]) > _TOO_LONG):
+            logger.warning(
+                "Resetting scale due to gap in reports: "
+                f"{dt:0.3f} > {_TOO_LONG} s")
+            self._reset_sync()
+            return False
+        history_time.append(swu.scale_time)
+        history_weight.append(swu.weight)
+        return True
+
+    def _estimate(self, swu: ScaleWeightUpdate) -> WeightAndFlowUpdate:
+        """
+        Run the estimators over the history, through swu
+        """
+        self._window_time = list(self._history_time)
+        self._window_weight = list(self._history_weight)
+
+        # There's nothing here really parallelizable
+        for estimate in self._estimate_fns:
+            estimate()
+        self._current_weight_valid_until = (self._current_weight_time
+                                            + self.CURRENT_WEIGHT_MAX_AGE)
+
+        wafu = self._update_pool[self._update_pool_index]
+        self._update_pool_index ^= 1
+        wafu.arrival_time = swu.arrival_time
+        wafu.create_time = time.time()
+        wafu.scale_time = swu.scale_time
+        wafu.current_weight = self._current_weight
+        wafu.current_weight_time = self._current_weight_time
+        wafu.average_flow = self._average_flow
+        wafu.average_flow_time = self._average_flow_time
+        wafu.median_weight = self._median_weight
+        wafu.median_weight_time = self._median_weight_time
+        wafu.median_flow = self._median_flow
+        wafu.median_flow_time = self._median_flow_time
+        return wafu
 
     async def _state_update_subscriber(self, su: StateUpdate):
         scale = self.scale
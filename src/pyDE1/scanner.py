@@ -51,6 +51,8 @@ class _RegisteredPrefixes:
 
     def __init__(self):
         self._prefixes = dict()
+        # Registration is at import, so build the frozensets once
+        self._frozen: dict[DeviceRole, frozenset[str]] = dict()
         for role in DeviceRole:
             self._prefixes[role]: set[str] = set()
         self.add_to_role('', DeviceRole.UNKNOWN)
@@ -58,11 +60,15 @@ class _RegisteredPrefixes:
     def get_for_role(self, role: DeviceRole):
         if role is None:
             return frozenset()
-        else:
-            return frozenset(self._prefixes[role])
+        try:
+            return self._frozen[role]
+        except KeyError:
+            fs = self._frozen[role] = frozenset(self._prefixes[role])
+            return fs
 
     def add_to_role(self, prefix: str, role: DeviceRole):
         self._prefixes[role].add(prefix)
+        self._frozen.pop(role, None)
 
 
 RegisteredPrefixes = _RegisteredPrefixes()
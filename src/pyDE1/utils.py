@@ -52,12 +52,15 @@ def cancel_tasks_by_name(name_to_cancel: str, starts_with=False):
             t.cancel()
 
 
-def address_is_persistent(address: str) -> bool:
+_MAC_ADDRESS_RE = re.compile(r'([0-9a-fA-F]{2}:){5}[0-9a-fA-F]{2}$')
+
+
+def address_is_persistent(address: Optional[str]) -> bool:
     """
     CoreBluetooth uses a UUID rather than a MAC address to identify devices
     As a result, it is (probably) not persistent over reboots.
     """
-    if re.match(r'([0-9a-fA-F]{2}:){5}[0-9a-fA-F]{2}$', address):
+    if address and _MAC_ADDRESS_RE.match(address):
         return True
     else:
         # macOS UUIDs don't seem to be persistent across Mac reboots
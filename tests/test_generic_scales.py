@@ -8,8 +8,10 @@ SPDX-License-Identifier: GPL-3.0-only
 import asyncio
 import logging
 import pprint
+import time
 from asyncio import iscoroutinefunction
 
+import aiosqlite
 import pytest
 from bleak import BLEDevice
 
@@ -20,6 +22,7 @@ from pyDE1.event_manager.events import ConnectivityState, DeviceRole
 from pyDE1.exceptions import DE1NotConnectedError, DE1UnsupportedDeviceError, \
     DE1RuntimeError
 from pyDE1.scale.acaia import AcaiaAcaia
+from pyDE1.scale.events import ScaleWeightUpdate
 
 from pyDE1.scale.generic_scale import GenericScale, register_scale_class
 from pyDE1.scale.atomax_skale_ii import AtomaxSkaleII
@@ -88,7 +91,25 @@ async def test_initialize_and_registration():
     assert gs.connectivity_state == ConnectivityState.INITIAL
 
 
-def test_prefix_to_class(monkeypatch):
+@pytest.fixture
+def restore_scale_registry():
+    """
+    Classes registered in a test are removed afterwards, along with
+    any lookups cached for them
+    """
+    registry = pyDE1.scale.generic_scale._prefix_to_class
+    saved_registry = dict(registry)
+    saved_prefixes = set(RegisteredPrefixes._prefixes[DeviceRole.SCALE])
+    yield
+    # Restore in place, as monkeypatch may have replaced the module's dict
+    registry.clear()
+    registry.update(saved_registry)
+    RegisteredPrefixes._prefixes[DeviceRole.SCALE] = saved_prefixes
+    RegisteredPrefixes._frozen.pop(DeviceRole.SCALE, None)
+    pyDE1.scale.generic_scale._prefix_scan.cache_clear()
+
+
+def test_prefix_to_class(monkeypatch, restore_scale_registry):
 
     @register_scale_class
     class AnotherScale (GenericScale):
@@ -108,6 +129,14 @@ def test_prefix_to_class(monkeypatch):
     with pytest.raises(DE1UnsupportedDeviceError):
         pyDE1.scale.generic_scale.prefix_to_class('another')
 
+    # Longest prefix wins, registration invalidates prior lookups
+    @register_scale_class
+    class LongerScale (GenericScale):
+        _supports_prefixes = ['Scal']
+
+    assert pyDE1.scale.generic_scale.prefix_to_class('Scale') == LongerScale
+    assert pyDE1.scale.generic_scale.prefix_to_class('Sca') == AnotherScale
+
     monkeypatch.setattr('pyDE1.scale.generic_scale._prefix_to_class', dict())
 
     with pytest.raises(DE1RuntimeError):
@@ -215,9 +244,9 @@ async def test_no_class_cruft():
 
     def save_pointers (scale: GenericScale):
         return [getattr(scale, a) for a in [
-            '_event_weight_update',
-            '_event_button_press',
-            '_event_tare_seen',
+            'event_weight_update',
+            'event_button_press',
+            'event_tare_seen',
             '_event_scale_changed',
             '_period_estimator',
         ]]
@@ -238,6 +267,107 @@ async def test_no_class_cruft():
     assert acaia_pointers == generic_pointers
 
 
+@pytest.mark.asyncio
+async def test_self_callback_runs_first():
+
+    gs = GenericScale()
+    await asyncio.sleep(0)
+    # GenericScale.__init__ doesn't subscribe or publish
+    assert not gs.event_weight_update.has_subscribers
+    assert gs.event_scale_changed.last_sent is None
+    seen = []
+
+    async def downstream(swu: ScaleWeightUpdate):
+        seen.append((gs._tare_requested, gs._last_weight_update_received))
+
+    # Subscribed before the scale subscribes itself on connection
+    await gs.event_weight_update.subscribe(downstream)
+    await gs._subscribe_self_callback()
+    # Only once, however many connections
+    await gs._subscribe_self_callback()
+    assert len(gs.event_weight_update._subscribers) == 2
+
+    gs._tare_requested = True
+    gs._tare_expire_handle = asyncio.get_running_loop().call_later(
+        10, lambda: None)
+    now = time.time()
+    await gs.event_weight_update.publish(
+        ScaleWeightUpdate(arrival_time=now, scale_time=now, weight_cg=0))
+
+    assert seen == [(False, now)]
+
+
+@pytest.mark.asyncio
+async def test_weight_update_pump():
+
+    gs = GenericScale()
+    seen = []
+
+    async def downstream(swu: ScaleWeightUpdate):
+        seen.append(swu.weight_cg)
+
+    await gs.event_weight_update.subscribe(downstream)
+
+    # Overflow before the pump runs, the oldest are dropped and counted
+    maxlen = gs._weight_update_ring.maxlen
+    now = time.time()
+    for w in range(maxlen + 3):
+        gs._queue_weight_update(
+            ScaleWeightUpdate(arrival_time=now, scale_time=now, weight_cg=w))
+    assert gs._weight_updates_dropped == 3
+
+    gs._start_weight_update_pump()
+    await asyncio.sleep(0.01)
+    assert seen == list(range(3, maxlen + 3))
+
+    pump = gs._weight_update_pump_task
+    await gs.release()
+    assert pump.done()
+    assert gs._weight_update_pump_task is None
+
+
+@pytest.mark.asyncio
+async def test_release_from_subscriber():
+
+    gs = GenericScale()
+    await gs.change_address('11:22:33:44:55:66')
+    gs._db_enabled = True
+    gs._db = db = await aiosqlite.connect(':memory:')
+    seen = []
+
+    async def releases(swu: ScaleWeightUpdate):
+        seen.append(swu.weight_cg)
+        await gs.release()
+
+    await gs.event_weight_update.subscribe(releases)
+    gs._start_weight_update_pump()
+    pump = gs._weight_update_pump_task
+    now = time.time()
+    for w in range(3):
+        gs._queue_weight_update(
+            ScaleWeightUpdate(arrival_time=now, scale_time=now, weight_cg=w))
+    await asyncio.wait_for(pump, timeout=1)
+
+    # The pump wasn't cancelled under release(), so the database was closed
+    assert seen == [0]
+    assert gs._db is None
+    with pytest.raises(ValueError):
+        await db.execute('SELECT 1')
+    assert pump.done() and not pump.cancelled()
+
+
+@pytest.mark.asyncio
+async def test_db_not_reopened_after_release():
+
+    gs = GenericScale()
+    await gs.change_address('11:22:33:44:55:66')
+    await gs.release()
+    assert await gs._get_db() is None
+    # A late persist is skipped rather than reopening the connection
+    await gs._persist_period_to_db()
+    assert gs._db is None
+
+
 
 @pytest.mark.skip
 @pytest.mark.live
@@ -288,3 +288,53 @@ async def test_publish_new(mock_send_to_outbound_pipes,
     print()
     print(caplog.text)
 
+
+class InternalPayload (EventPayload):
+
+    _internal_only = True
+
+    def __init__(self, arrival_time: float):
+        super(InternalPayload, self).__init__(arrival_time=arrival_time)
+
+
+@pytest.mark.asyncio
+async def test_publish_no_subscribers(mock_send_to_outbound_pipes,
+                                      caplog):
+    se = SubscribedEvent('will render as the class str')
+    mock_send_to_outbound_pipes.notify = True
+    assert not se.has_subscribers
+
+    ep = InternalPayload(arrival_time=time.time())
+    assert await se.publish(ep) == []
+    assert ep.sender == 'will render as the class str'
+    assert ep.event_time is not None
+    assert se.last_sent.create_time == ep.create_time
+
+    # External payloads are still sent without subscribers
+    await se.publish(TestPayload(arrival_time=time.time(), text='test text'))
+    outbound_sent_count = 0
+    for record in caplog.records:
+        if record.name == 'Notify.Outbound':
+            outbound_sent_count += 1
+    assert outbound_sent_count == 1
+
+    await se.subscribe(coro)
+    assert se.has_subscribers
+
+
+@pytest.mark.asyncio
+async def test_publish_predicate(mock_send_to_outbound_pipes,
+                                 caplog):
+    se = SubscribedEvent('will render as the class str')
+    mock_send_to_outbound_pipes.notify = True
+
+    await se.subscribe(coro, predicate=lambda p: p.text == 'wanted')
+    await se.subscribe(coro_again)
+    await se.publish(TestPayload(arrival_time=time.time(), text='other'))
+    await se.publish(TestPayload(arrival_time=time.time(), text='wanted'))
+    called_list = []
+    for record in caplog.records:
+        if record.name == 'Notify':
+            called = record.message.split('(', maxsplit=1)[0]
+            called_list.append(called)
+    assert called_list == ['coro_again', 'coro', 'coro_again']